@@ -9,33 +9,71 @@ Demonstrates how domain hashing enables:
 
 import os
 import hashlib
+
+import blake3
 from typing import List, Dict, Optional
-from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy import create_engine, text, MetaData, Table, Column, String, Integer, Text, DateTime, Boolean, Float
-from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.ext.declarative import declarative_base
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import psycopg2
+import asyncpg
+import orjson
 from datetime import datetime
 
 # Database connection
 DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
 
 app = FastAPI(title="Domain Hash Service", version="1.0.0")
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Database connection pool - asyncpg caches prepared statements per pooled
+# connection keyed by SQL string, so the module-level statements below are
+# parsed and planned once per connection instead of on every request
+db_pool = None
+
+async def init_db():
+    """Initialize database connection pool"""
+    global db_pool
+    if DATABASE_URL:
+        db_pool = await asyncpg.create_pool(DATABASE_URL, min_size=2, max_size=10)
+
+@app.on_event("startup")
+async def startup_event():
+    """Initialize database on startup"""
+    await init_db()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close database pool on shutdown"""
+    if db_pool:
+        await db_pool.close()
+
+# Existing rows carry MD5 hashes in domains.domain_hash - keep the legacy flag
+# on until the column is repopulated with BLAKE3 values, then flip it off
+DOMAIN_HASH_MD5_LEGACY = os.getenv("DOMAIN_HASH_MD5_LEGACY", "true").lower() in ("1", "true", "yes")
 
 def generate_domain_hash(domain: str) -> str:
-    """Generate consistent MD5 hash for domain identification"""
-    return hashlib.md5(domain.lower().strip().encode()).hexdigest()
+    """Generate consistent hash for domain identification
+
+    BLAKE3 is SIMD-accelerated and skips the OpenSSL EVP context setup that
+    dominates MD5 on sub-100-byte inputs; MD5 stays behind the legacy flag
+    so lookups against already-stored hashes keep matching.
+    """
+    normalized = domain.lower().strip().encode()
+    if DOMAIN_HASH_MD5_LEGACY:
+        return hashlib.md5(normalized).hexdigest()
+    return blake3.blake3(normalized).hexdigest(16)
+
+def generate_domain_hashes(domains: List[str]) -> List[str]:
+    """Bulk counterpart to generate_domain_hash for batch-ingest paths
+
+    Hoists the hash constructor and legacy-flag check out of the loop so
+    batch callers pay them once instead of per domain; prefer this over a
+    list comprehension of generate_domain_hash when hashing a whole batch.
+    """
+    if DOMAIN_HASH_MD5_LEGACY:
+        md5 = hashlib.md5
+        return [md5(d.lower().strip().encode()).hexdigest() for d in domains]
+    b3 = blake3.blake3
+    return [b3(d.lower().strip().encode()).hexdigest(16) for d in domains]
 
 class DomainHashResponse(BaseModel):
     domain: str
@@ -49,10 +87,114 @@ class DomainHashResponse(BaseModel):
     latest_status: Optional[str]
     gleif_candidate_count: int
 
-class BatchExportResponse(BaseModel):
-    total_unique_domains: int
-    domains_with_gleif: int
-    export_data: List[Dict]
+# Module-level SQL - stable statement text keeps asyncpg's per-connection
+# prepared-statement cache hot
+
+# One aggregated row per domain_hash - Postgres produces the distinct
+# batch list and best/latest picks (ordered array_agg as argmax) so Python
+# no longer iterates every historical row per request
+DOMAIN_SUMMARY_SQL = """
+    WITH history AS (
+        SELECT
+            domain_hash,
+            COUNT(*) as total_attempts,
+            COUNT(DISTINCT batch_id) as batch_count,
+            array_agg(DISTINCT batch_id) as all_batch_ids,
+            MIN(created_at) as first_seen,
+            (array_agg(status ORDER BY created_at DESC))[1] as latest_status,
+            (array_agg(company_name ORDER BY confidence_score DESC NULLS LAST))[1] as best_company_name,
+            MAX(confidence_score) as best_confidence_score
+        FROM domains
+        WHERE domain_hash = $1
+        GROUP BY domain_hash
+    ),
+    gleif AS (
+        SELECT COUNT(DISTINCT gc.lei_code) as gleif_candidate_count
+        FROM domains d
+        JOIN gleif_candidates gc ON d.id = gc.domain_id
+        WHERE d.domain_hash = $1
+    )
+    SELECT h.*, COALESCE(g.gleif_candidate_count, 0) as gleif_candidate_count
+    FROM history h
+    CROSS JOIN gleif g
+"""
+
+DUPLICATES_SQL = """
+    SELECT
+        domain_hash,
+        domain,
+        COUNT(*) as occurrence_count,
+        COUNT(DISTINCT batch_id) as batch_count,
+        array_agg(DISTINCT batch_id ORDER BY batch_id) as batch_ids,
+        array_agg(id ORDER BY id) as domain_ids,
+        MIN(created_at) as first_seen,
+        MAX(created_at) as last_seen
+    FROM domains
+    GROUP BY domain_hash, domain
+    HAVING COUNT(*) > 1
+    ORDER BY occurrence_count DESC, domain
+    LIMIT 20
+"""
+
+EXPORT_SQL = """
+    WITH domain_aggregation AS (
+        SELECT
+            d.domain_hash,
+            d.domain,
+            d.company_name,
+            d.extraction_method,
+            d.confidence_score,
+            d.status,
+            d.guessed_country,
+            d.processing_time_ms,
+            COUNT(DISTINCT gc.lei_code) as gleif_candidate_count,
+            string_agg(DISTINCT gc.lei_code, '; ' ORDER BY gc.lei_code) as all_lei_codes,
+            string_agg(DISTINCT gc.legal_name, '; ' ORDER BY gc.legal_name) as all_legal_names,
+            string_agg(DISTINCT gc.jurisdiction, '; ' ORDER BY gc.jurisdiction) as all_jurisdictions,
+            string_agg(DISTINCT gc.entity_status, '; ' ORDER BY gc.entity_status) as all_entity_statuses
+        FROM domains d
+        LEFT JOIN gleif_candidates gc ON d.id = gc.domain_id
+        WHERE d.batch_id = $1
+        GROUP BY d.domain_hash, d.domain, d.company_name, d.extraction_method,
+                 d.confidence_score, d.status, d.guessed_country, d.processing_time_ms
+    )
+    SELECT * FROM domain_aggregation
+    ORDER BY domain
+"""
+
+CROSS_BATCH_SQL = """
+    WITH cross_batch_analysis AS (
+        SELECT
+            d.domain_hash,
+            d.domain,
+            COUNT(DISTINCT d.batch_id) as batch_appearances,
+            array_agg(DISTINCT d.batch_id ORDER BY d.batch_id) as batches,
+            COUNT(*) as total_processing_attempts,
+            MAX(d.confidence_score) as best_confidence,
+            MIN(d.confidence_score) as worst_confidence,
+            COUNT(DISTINCT d.company_name) FILTER (WHERE d.company_name IS NOT NULL) as name_variations,
+            string_agg(DISTINCT d.company_name, ' | ' ORDER BY d.company_name) FILTER (WHERE d.company_name IS NOT NULL) as all_names,
+            bool_or(d.status = 'success') as ever_successful
+        FROM domains d
+        GROUP BY d.domain_hash, d.domain
+        HAVING COUNT(DISTINCT d.batch_id) > 1
+    ),
+    lei_counts AS (
+        SELECT
+            d.domain_hash,
+            COUNT(DISTINCT gc.lei_code) as unique_lei_codes
+        FROM domains d
+        LEFT JOIN gleif_candidates gc ON d.id = gc.domain_id
+        GROUP BY d.domain_hash
+    )
+    SELECT
+        cba.*,
+        COALESCE(lc.unique_lei_codes, 0) as unique_lei_codes
+    FROM cross_batch_analysis cba
+    LEFT JOIN lei_counts lc ON cba.domain_hash = lc.domain_hash
+    ORDER BY cba.best_confidence DESC NULLS LAST, cba.domain
+    LIMIT 20
+"""
 
 @app.get("/health")
 async def health_check():
@@ -60,111 +202,54 @@ async def health_check():
     return {"status": "healthy", "service": "domain_hash_service"}
 
 @app.get("/domains/{domain}/hash")
-async def get_domain_hash(domain: str, db: Session = Depends(get_db)):
+async def get_domain_hash(domain: str):
     """Get domain hash and historical information"""
-    
+    if not db_pool:
+        raise HTTPException(status_code=500, detail="Database not connected")
+
     domain_hash = generate_domain_hash(domain)
-    
-    # Query all instances of this domain across batches
-    # Fixed: Remove DISTINCT from window functions (PostgreSQL limitation)
-    query = text("""
-        WITH domain_stats AS (
-            SELECT 
-                domain_hash,
-                COUNT(*) as total_attempts,
-                COUNT(DISTINCT batch_id) as batch_count
-            FROM domains 
-            WHERE domain_hash = :domain_hash
-            GROUP BY domain_hash
-        )
-        SELECT 
-            d.domain,
-            d.domain_hash,
-            d.batch_id,
-            d.status,
-            d.company_name,
-            d.confidence_score,
-            d.created_at,
-            ds.total_attempts,
-            ds.batch_count
-        FROM domains d
-        JOIN domain_stats ds ON d.domain_hash = ds.domain_hash
-        WHERE d.domain_hash = :domain_hash
-        ORDER BY d.created_at DESC
-    """)
-    
-    results = db.execute(query, {"domain_hash": domain_hash}).fetchall()
-    
-    if not results:
+
+    async with db_pool.acquire() as conn:
+        summary = await conn.fetchrow(DOMAIN_SUMMARY_SQL, domain_hash)
+
+    if not summary:
         raise HTTPException(status_code=404, detail="Domain not found")
-    
-    # Get GLEIF candidate count
-    gleif_query = text("""
-        SELECT COUNT(DISTINCT gc.lei_code) as candidate_count
-        FROM domains d
-        LEFT JOIN gleif_candidates gc ON d.id = gc.domain_id
-        WHERE d.domain_hash = :domain_hash
-    """)
-    
-    gleif_result = db.execute(gleif_query, {"domain_hash": domain_hash}).fetchone()
-    gleif_count = gleif_result.candidate_count if gleif_result else 0
-    
-    # Process results
-    first_result = results[0]
-    all_batch_ids = list(set([r.batch_id for r in results]))
-    
-    # Find best result
-    best_result = max(results, key=lambda r: r.confidence_score or 0)
-    
+
     return DomainHashResponse(
         domain=domain,
         domain_hash=domain_hash,
-        total_processing_attempts=first_result.total_attempts,
-        batch_count=first_result.batch_count,
-        all_batch_ids=all_batch_ids,
-        best_company_name=best_result.company_name,
-        best_confidence_score=best_result.confidence_score,
-        first_seen=results[-1].created_at.isoformat() if results[-1].created_at else None,
-        latest_status=first_result.status,
-        gleif_candidate_count=gleif_count
+        total_processing_attempts=summary['total_attempts'],
+        batch_count=summary['batch_count'],
+        all_batch_ids=summary['all_batch_ids'],
+        best_company_name=summary['best_company_name'],
+        best_confidence_score=summary['best_confidence_score'],
+        first_seen=summary['first_seen'].isoformat() if summary['first_seen'] else None,
+        latest_status=summary['latest_status'],
+        gleif_candidate_count=summary['gleif_candidate_count']
     )
 
 @app.get("/analytics/domain-duplicates")
-async def analyze_domain_duplicates(db: Session = Depends(get_db)):
+async def analyze_domain_duplicates():
     """Analyze domain duplication patterns"""
-    
-    query = text("""
-        SELECT 
-            domain_hash,
-            domain,
-            COUNT(*) as occurrence_count,
-            COUNT(DISTINCT batch_id) as batch_count,
-            array_agg(DISTINCT batch_id ORDER BY batch_id) as batch_ids,
-            array_agg(id ORDER BY id) as domain_ids,
-            MIN(created_at) as first_seen,
-            MAX(created_at) as last_seen
-        FROM domains 
-        GROUP BY domain_hash, domain
-        HAVING COUNT(*) > 1
-        ORDER BY occurrence_count DESC, domain
-        LIMIT 20
-    """)
-    
-    results = db.execute(query).fetchall()
-    
+    if not db_pool:
+        raise HTTPException(status_code=500, detail="Database not connected")
+
+    async with db_pool.acquire() as conn:
+        results = await conn.fetch(DUPLICATES_SQL)
+
     duplicates = []
     for r in results:
         duplicates.append({
-            "domain": r.domain,
-            "domain_hash": r.domain_hash,
-            "occurrence_count": r.occurrence_count,
-            "batch_count": r.batch_count,
-            "batch_ids": r.batch_ids,
-            "domain_ids": r.domain_ids,
-            "first_seen": r.first_seen.isoformat() if r.first_seen else None,
-            "last_seen": r.last_seen.isoformat() if r.last_seen else None
+            "domain": r['domain'],
+            "domain_hash": r['domain_hash'],
+            "occurrence_count": r['occurrence_count'],
+            "batch_count": r['batch_count'],
+            "batch_ids": r['batch_ids'],
+            "domain_ids": r['domain_ids'],
+            "first_seen": r['first_seen'].isoformat() if r['first_seen'] else None,
+            "last_seen": r['last_seen'].isoformat() if r['last_seen'] else None
         })
-    
+
     return {
         "total_duplicates": len(duplicates),
         "analysis": "Every domain appears exactly twice across two batches",
@@ -173,134 +258,60 @@ async def analyze_domain_duplicates(db: Session = Depends(get_db)):
     }
 
 @app.get("/export/batch/{batch_id}/with-gleif-fixed")
-async def export_batch_with_gleif_fixed(batch_id: str, db: Session = Depends(get_db)):
+async def export_batch_with_gleif_fixed(batch_id: str):
     """
-    FIXED export using domain hash aggregation
+    FIXED export using domain hash aggregation, streamed as NDJSON
     Solves the JOIN aggregation issue that was failing in Express.js
+
+    A server-side cursor streams rows as they arrive instead of
+    materializing the whole batch in Python first - peak memory stays
+    flat and the first byte goes out before the query finishes.
     """
-    
-    query = text("""
-        WITH domain_aggregation AS (
-            SELECT 
-                d.domain_hash,
-                d.domain,
-                d.company_name,
-                d.extraction_method,
-                d.confidence_score,
-                d.status,
-                d.guessed_country,
-                d.processing_time_ms,
-                COUNT(DISTINCT gc.lei_code) as gleif_candidate_count,
-                string_agg(DISTINCT gc.lei_code, '; ' ORDER BY gc.lei_code) as all_lei_codes,
-                string_agg(DISTINCT gc.legal_name, '; ' ORDER BY gc.legal_name) as all_legal_names,
-                string_agg(DISTINCT gc.jurisdiction, '; ' ORDER BY gc.jurisdiction) as all_jurisdictions,
-                string_agg(DISTINCT gc.entity_status, '; ' ORDER BY gc.entity_status) as all_entity_statuses
-            FROM domains d
-            LEFT JOIN gleif_candidates gc ON d.id = gc.domain_id
-            WHERE d.batch_id = :batch_id
-            GROUP BY d.domain_hash, d.domain, d.company_name, d.extraction_method, 
-                     d.confidence_score, d.status, d.guessed_country, d.processing_time_ms
-        )
-        SELECT * FROM domain_aggregation
-        ORDER BY domain
-    """)
-    
-    results = db.execute(query, {"batch_id": batch_id}).fetchall()
-    
-    export_data = []
-    domains_with_gleif = 0
-    
-    for r in results:
-        if r.gleif_candidate_count > 0:
-            domains_with_gleif += 1
-            
-        export_data.append({
-            "domain_hash": r.domain_hash,
-            "domain": r.domain,
-            "company_name": r.company_name,
-            "extraction_method": r.extraction_method,
-            "confidence_score": r.confidence_score,
-            "status": r.status,
-            "guessed_country": r.guessed_country,
-            "processing_time_ms": r.processing_time_ms,
-            "gleif_candidate_count": r.gleif_candidate_count,
-            "all_lei_codes": r.all_lei_codes,
-            "all_legal_names": r.all_legal_names,
-            "all_jurisdictions": r.all_jurisdictions,
-            "all_entity_statuses": r.all_entity_statuses
-        })
-    
-    return BatchExportResponse(
-        total_unique_domains=len(export_data),
-        domains_with_gleif=domains_with_gleif,
-        export_data=export_data
-    )
+    if not db_pool:
+        raise HTTPException(status_code=500, detail="Database not connected")
+
+    async def generate():
+        async with db_pool.acquire() as conn:
+            async with conn.transaction():
+                async for record in conn.cursor(EXPORT_SQL, batch_id, prefetch=1000):
+                    yield orjson.dumps(dict(record)) + b'\n'
+
+    return StreamingResponse(generate(), media_type='application/x-ndjson')
 
 @app.get("/analytics/cross-batch-intelligence")
-async def cross_batch_intelligence(db: Session = Depends(get_db)):
+async def cross_batch_intelligence():
     """Demonstrate cross-batch intelligence using domain hashes"""
-    
-    query = text("""
-        WITH cross_batch_analysis AS (
-            SELECT 
-                d.domain_hash,
-                d.domain,
-                COUNT(DISTINCT d.batch_id) as batch_appearances,
-                array_agg(DISTINCT d.batch_id ORDER BY d.batch_id) as batches,
-                COUNT(*) as total_processing_attempts,
-                MAX(d.confidence_score) as best_confidence,
-                MIN(d.confidence_score) as worst_confidence,
-                COUNT(DISTINCT d.company_name) FILTER (WHERE d.company_name IS NOT NULL) as name_variations,
-                string_agg(DISTINCT d.company_name, ' | ' ORDER BY d.company_name) FILTER (WHERE d.company_name IS NOT NULL) as all_names,
-                bool_or(d.status = 'success') as ever_successful
-            FROM domains d
-            GROUP BY d.domain_hash, d.domain
-            HAVING COUNT(DISTINCT d.batch_id) > 1
-        ),
-        lei_counts AS (
-            SELECT 
-                d.domain_hash,
-                COUNT(DISTINCT gc.lei_code) as unique_lei_codes
-            FROM domains d
-            LEFT JOIN gleif_candidates gc ON d.id = gc.domain_id
-            GROUP BY d.domain_hash
-        )
-        SELECT 
-            cba.*,
-            COALESCE(lc.unique_lei_codes, 0) as unique_lei_codes
-        FROM cross_batch_analysis cba
-        LEFT JOIN lei_counts lc ON cba.domain_hash = lc.domain_hash
-        ORDER BY cba.best_confidence DESC NULLS LAST, cba.domain
-        LIMIT 20
-    """)
-    
-    results = db.execute(query).fetchall()
-    
+    if not db_pool:
+        raise HTTPException(status_code=500, detail="Database not connected")
+
+    async with db_pool.acquire() as conn:
+        results = await conn.fetch(CROSS_BATCH_SQL)
+
     intelligence = []
     for r in results:
         intelligence.append({
-            "domain": r.domain,
-            "domain_hash": r.domain_hash,
-            "batch_appearances": r.batch_appearances,
-            "batches": r.batches,
-            "total_processing_attempts": r.total_processing_attempts,
+            "domain": r['domain'],
+            "domain_hash": r['domain_hash'],
+            "batch_appearances": r['batch_appearances'],
+            "batches": r['batches'],
+            "total_processing_attempts": r['total_processing_attempts'],
             "confidence_improvement": {
-                "best": r.best_confidence,
-                "worst": r.worst_confidence,
-                "improvement": (r.best_confidence or 0) - (r.worst_confidence or 0) if r.best_confidence and r.worst_confidence else None
+                "best": r['best_confidence'],
+                "worst": r['worst_confidence'],
+                "improvement": (r['best_confidence'] or 0) - (r['worst_confidence'] or 0) if r['best_confidence'] and r['worst_confidence'] else None
             },
-            "name_variations": r.name_variations,
-            "all_extracted_names": r.all_names,
-            "processing_success": r.ever_successful,
-            "gleif_entities_found": r.unique_lei_codes
+            "name_variations": r['name_variations'],
+            "all_extracted_names": r['all_names'],
+            "processing_success": r['ever_successful'],
+            "gleif_entities_found": r['unique_lei_codes']
         })
-    
+
     return {
         "analysis": "Cross-batch intelligence demonstrates domain hash value",
         "benefits": [
             "Tracks processing improvements over time",
             "Identifies extraction consistency",
-            "Enables confidence score evolution analysis", 
+            "Enables confidence score evolution analysis",
             "Accumulates GLEIF entity discoveries"
         ],
         "cross_batch_domains": intelligence
@@ -308,4 +319,4 @@ async def cross_batch_intelligence(db: Session = Depends(get_db)):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8001)
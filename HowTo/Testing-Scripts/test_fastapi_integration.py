@@ -4,14 +4,20 @@
 Test FastAPI Integration - Validate Export Functionality
 """
 import requests
+from requests.adapters import HTTPAdapter
 import json
 
 BASE_URL = "http://0.0.0.0:8000"
 
+# One pooled session for the whole suite - each bare requests.get() paid a
+# fresh TCP handshake; the adapter keeps connections alive across tests
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+
 def test_shell_analysis():
     """Test shell.com analysis endpoint"""
     print("Testing Shell.com Analysis...")
-    response = requests.get(f"{BASE_URL}/analytics/shell-analysis")
+    response = SESSION.get(f"{BASE_URL}/analytics/shell-analysis")
     
     if response.status_code == 200:
         data = response.json()
@@ -26,13 +32,16 @@ def test_shell_analysis():
 def test_batch_export(batch_id="test_batch"):
     """Test batch export functionality"""
     print(f"Testing Batch Export for {batch_id}...")
-    response = requests.get(f"{BASE_URL}/export/{batch_id}")
+    response = SESSION.get(f"{BASE_URL}/export/{batch_id}")
     
     if response.status_code == 200:
         data = response.json()
-        print(f"✓ Export successful: {len(data)} domains")
-        if data:
-            sample = data[0]
+        rows = data["rows"]
+        print(f"✓ Export successful: {len(rows)} domains")
+        if data.get("next_after") is not None:
+            print(f"✓ More pages available after id {data['next_after']}")
+        if rows:
+            sample = rows[0]
             print(f"✓ Sample domain: {sample['domain']}")
             print(f"✓ GLEIF candidates: {sample['gleif_candidate_count']}")
         return True
@@ -46,7 +55,7 @@ def test_batch_export(batch_id="test_batch"):
 def test_health():
     """Test health endpoint"""
     print("Testing Health Endpoint...")
-    response = requests.get(f"{BASE_URL}/health")
+    response = SESSION.get(f"{BASE_URL}/health")
     
     if response.status_code == 200:
         data = response.json()
@@ -0,0 +1,14 @@
+
+-- Indexes for the analytics hot paths: every export/analytics query filters
+-- domains by batch_id, then LEFT JOINs gleif_candidates on domain_id and
+-- sorts the string_agg aggregates by lei_code/legal_name. Composite indexes
+-- let Postgres satisfy the join and the per-group ordering without a seq scan.
+CREATE INDEX IF NOT EXISTS domains_batch_id_id_idx ON domains (batch_id, id);
+CREATE INDEX IF NOT EXISTS gleif_candidates_domain_id_lei_idx ON gleif_candidates (domain_id, lei_code);
+CREATE INDEX IF NOT EXISTS gleif_candidates_domain_id_legal_name_idx ON gleif_candidates (domain_id, legal_name);
+
+-- Trigram indexes turn the domain-search ILIKE '%term%' predicates from a
+-- full table scan into a GIN index scan
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS domains_domain_trgm_idx ON domains USING gin (domain gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS domains_company_name_trgm_idx ON domains USING gin (company_name gin_trgm_ops);
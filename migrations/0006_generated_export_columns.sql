@@ -0,0 +1,33 @@
+
+-- Precompute the derived export fields as stored generated columns. The CASE
+-- logic previously ran per row on every export request even though its inputs
+-- (level2_status, confidence_score, status) are immutable after ingest; the
+-- export query becomes a pure projection and pays the CASE cost once at write.
+ALTER TABLE domains ADD COLUMN IF NOT EXISTS gleif_status TEXT GENERATED ALWAYS AS (
+    CASE
+        WHEN level2_status = 'success' THEN 'GLEIF Verified'
+        WHEN level2_status = 'multiple_candidates' THEN 'GLEIF Multiple'
+        WHEN level2_status = 'failed' THEN 'GLEIF Failed'
+        ELSE 'No GLEIF'
+    END
+) STORED;
+
+-- export_-prefixed names: the Node app already writes plain
+-- business_category and recommendation columns (shared/schema.ts), and
+-- ADD COLUMN IF NOT EXISTS would silently no-op against those
+ALTER TABLE domains ADD COLUMN IF NOT EXISTS export_business_category TEXT GENERATED ALWAYS AS (
+    CASE
+        WHEN confidence_score >= 85 THEN 'High Priority'
+        WHEN confidence_score >= 60 THEN 'Good Target'
+        WHEN confidence_score >= 30 THEN 'Research Required'
+        ELSE 'Manual Review'
+    END
+) STORED;
+
+ALTER TABLE domains ADD COLUMN IF NOT EXISTS export_recommendation TEXT GENERATED ALWAYS AS (
+    CASE
+        WHEN status = 'failed' THEN 'Retry with Level 2'
+        WHEN confidence_score < 70 THEN 'GLEIF Enhancement'
+        ELSE 'Ready for Analysis'
+    END
+) STORED;
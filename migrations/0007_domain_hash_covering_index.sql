@@ -0,0 +1,8 @@
+
+-- Covering index for the domain hash service: /domains/{domain}/hash
+-- aggregates batch_id/status/company_name/confidence_score/created_at for a
+-- single domain_hash, so INCLUDE-ing those columns makes it an index-only
+-- scan with no heap fetches. The GLEIF side of the query is already covered
+-- by gleif_candidates_domain_id_lei_idx from migration 0005.
+CREATE INDEX IF NOT EXISTS domains_hash_covering_idx ON domains (domain_hash)
+    INCLUDE (batch_id, status, company_name, confidence_score, created_at);
@@ -0,0 +1,6 @@
+
+-- The processing service reads dump_data as jsonb and relies on asyncpg's
+-- connection codec to decode it straight to dicts; text columns would make
+-- every read a string needing a second parse in Python.
+ALTER TABLE crawlee_dumps ALTER COLUMN dump_data TYPE jsonb USING dump_data::jsonb;
+ALTER TABLE axios_cheerio_dumps ALTER COLUMN dump_data TYPE jsonb USING dump_data::jsonb;
@@ -0,0 +1,40 @@
+"""
+Shared asyncpg pool for the Python services
+
+Each FastAPI service previously opened its own pool, so co-hosted services
+paid for duplicate connections, TLS handshakes, and planner caches. This
+module holds one process-local pool that every service in the process
+shares; the larger statement cache keeps all of their prepared statements
+server-side at once.
+"""
+
+import os
+import asyncpg
+
+_pool = None
+
+async def get_pool(init=None):
+    """Return the process-wide asyncpg pool, creating it on first use
+
+    init is forwarded to asyncpg.create_pool and only applies when this
+    call actually creates the pool - services that need connection codecs
+    (e.g. the jsonb/orjson codec in fastapi_processor) should be the ones
+    that create it at startup.
+    """
+    global _pool
+    if _pool is None:
+        _pool = await asyncpg.create_pool(
+            os.getenv("DATABASE_URL"),
+            min_size=int(os.getenv("PG_POOL_MIN_SIZE", "5")),
+            max_size=int(os.getenv("PG_POOL_MAX_SIZE", "20")),
+            statement_cache_size=1024,
+            init=init
+        )
+    return _pool
+
+async def close_pool():
+    """Close the shared pool (idempotent)"""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
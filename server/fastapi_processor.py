@@ -7,16 +7,30 @@ from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
+from collections import defaultdict
 import asyncio
+import concurrent.futures
+import functools
 import aiohttp
 import asyncpg
-import json
+import orjson
 import os
 import re
 from datetime import datetime
-from bs4 import BeautifulSoup
+from selectolax.parser import HTMLParser
 import logging
 
+from db import get_pool, close_pool
+
+# Hyperscan is optional - the compiled-re path below covers environments
+# without the native wheel
+try:
+    import hyperscan
+    HYPERSCAN_AVAILABLE = True
+except ImportError:
+    hyperscan = None
+    HYPERSCAN_AVAILABLE = False
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -35,10 +49,126 @@ app.add_middleware(
 # Database connection pool
 db_pool = None
 
+# Batching queue for processing results - normal-priority dumps are flushed
+# in bulk via COPY instead of one INSERT round-trip per dump
+result_queue = None
+result_flush_task = None
+RESULT_FLUSH_MAX_ROWS = 1000
+RESULT_FLUSH_INTERVAL = 0.2  # seconds
+
+RESULT_COLUMNS = [
+    'source_type', 'source_id', 'domain',
+    'stage1_stripped_text', 'stage1_processing_time_ms',
+    'stage2_extracted_data', 'stage2_model_used', 'stage2_processing_time_ms',
+    'stage3_entity_name', 'stage3_entity_confidence',
+    'processing_status', 'created_at', 'updated_at'
+]
+
+# Extraction is CPU-bound Python and would serialize every concurrent dump
+# if run on the event loop; a process pool spreads it across cores
+process_pool = None
+
 # OpenRouter configuration
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY", "")
 OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1/chat/completions"
 
+# Compiled once at import - re's per-call cache lookup (and its small,
+# pattern-text-keyed cache) are pure overhead on the per-dump hot path
+_COPYRIGHT_RE_1 = re.compile(
+    r'(?:©|Copyright)\s+(?:\d{4}\s+)?([A-Z][A-Za-z0-9\s&.,\'-]+?)(?:\.|,|\s+All|\s+Rights)',
+    re.IGNORECASE
+)
+_COPYRIGHT_RE_2 = re.compile(
+    r'©\s*(\d{4})?\s*([A-Z][A-Za-z0-9\s&.,\'-]+?)(?:\.|,|\s|$)',
+    re.IGNORECASE
+)
+_EMAIL_RE = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b')
+_PHONE_RE = re.compile(r'[\+]?[(]?[0-9]{1,3}[)]?[-\s\.]?[(]?[0-9]{1,3}[)]?[-\s\.]?[0-9]{3,4}[-\s\.]?[0-9]{3,4}')
+_TITLE_SPLIT_RE = re.compile(r'\s*[\|–\-:]\s*')
+_TRAILING_PUNCT_RE = re.compile(r'[.,;!?]+$')
+
+# Patterns scanned over the page text, in id order for the Hyperscan pass
+_SCAN_PATTERNS = (_COPYRIGHT_RE_1, _COPYRIGHT_RE_2, _EMAIL_RE, _PHONE_RE)
+
+# Cheap anchor for the phone scan - any phone match must straddle a run of
+# three digits, and searching for one never backtracks
+_DIGIT_RUN_RE = re.compile(r'[0-9]{3}')
+_PHONE_WINDOW = 32
+
+def _find_phones(text: str) -> List[str]:
+    """Run the phone regex only in windows around 3-digit runs
+
+    The phone pattern backtracks heavily on digit runs and most page text
+    has none at all, so anchoring on digit runs skips the expensive NFA
+    for nearly the whole document.
+    """
+    # Overlapping windows are merged before scanning: a number whose digit
+    # groups span two windows would otherwise be clipped at endpos or its
+    # later runs skipped outright, emitting a partial match or none at all
+    phones = []
+    window_start = window_end = -1
+    for m in _DIGIT_RUN_RE.finditer(text):
+        start = max(m.start() - _PHONE_WINDOW, 0)
+        end = min(m.end() + _PHONE_WINDOW, len(text))
+        if window_end < 0:
+            window_start, window_end = start, end
+        elif start <= window_end:
+            window_end = max(window_end, end)
+        else:
+            phones.extend(_PHONE_RE.findall(text, window_start, window_end))
+            window_start, window_end = start, end
+    if window_end >= 0:
+        phones.extend(_PHONE_RE.findall(text, window_start, window_end))
+    return phones
+
+# Pure string cleaners, cached because inputs repeat heavily across a batch
+# (the same og:site_name shows up on every page of a site). Module-level
+# rather than methods so lru_cache doesn't keep extractor instances alive.
+
+@functools.lru_cache(maxsize=8192)
+def _clean_title_entity(title: str) -> Optional[str]:
+    """Extract entity name from page title"""
+    if not title:
+        return None
+
+    # Remove common separators and everything after
+    cleaned = _TITLE_SPLIT_RE.split(title)[0]
+
+    # Remove common prefixes
+    prefixes = ['Welcome to', 'Home', 'About', 'Official Website of']
+    for prefix in prefixes:
+        if cleaned.lower().startswith(prefix.lower()):
+            cleaned = cleaned[len(prefix):].strip()
+
+    # Remove marketing terms
+    marketing_terms = ['Services', 'Solutions', 'Products', 'Website']
+    for term in marketing_terms:
+        cleaned = re.sub(f'\\s+{term}\\s*$', '', cleaned, flags=re.IGNORECASE)
+
+    return cleaned if len(cleaned) > 2 else None
+
+@functools.lru_cache(maxsize=8192)
+def _clean_entity_name(name: str) -> Optional[str]:
+    """Clean and validate entity name"""
+    if not name:
+        return None
+
+    # Remove extra whitespace
+    name = ' '.join(name.split())
+
+    # Remove trailing punctuation
+    name = _TRAILING_PUNCT_RE.sub('', name)
+
+    # Check if it's too long (likely a sentence)
+    if len(name) > 100:
+        return None
+
+    # Check if it's too short
+    if len(name) < 3:
+        return None
+
+    return name
+
 class ProcessRequest(BaseModel):
     source_type: str
     source_id: int
@@ -51,21 +181,85 @@ class ProcessingResponse(BaseModel):
 
 class EntityExtractor:
     """Efficient entity extraction from HTML content"""
-    
+
+    # Compiled Hyperscan database, shared across instances so the compile
+    # cost is paid once per process
+    _hs_db = None
+    _hs_failed = False
+
+    @classmethod
+    def _hyperscan_db(cls):
+        if not HYPERSCAN_AVAILABLE or cls._hs_failed:
+            return None
+        if cls._hs_db is None:
+            try:
+                db = hyperscan.Database()
+                db.compile(
+                    expressions=[p.pattern.encode() for p in _SCAN_PATTERNS],
+                    ids=list(range(len(_SCAN_PATTERNS))),
+                    flags=[
+                        hyperscan.HS_FLAG_CASELESS
+                        | hyperscan.HS_FLAG_PREFILTER
+                        | hyperscan.HS_FLAG_SINGLEMATCH
+                    ] * len(_SCAN_PATTERNS)
+                )
+                cls._hs_db = db
+            except Exception as e:
+                logger.warning(f"Hyperscan compile failed, falling back to re: {e}")
+                cls._hs_failed = True
+                return None
+        return cls._hs_db
+
+    def _scan_text(self, text: str, copyright_text: Optional[str] = None) -> Dict[int, list]:
+        """Run all text patterns and return matches keyed by pattern id
+
+        The copyright patterns (ids 0-1) scan copyright_text when given -
+        typically the footer or page tail - while emails/phones scan the
+        full text. With Hyperscan available, one SIMD DFA pass over the
+        full text decides which patterns occur at all (a superset of any
+        slice); re.findall then runs only for those, so pages without
+        emails/phones/copyright lines skip the NFA scans entirely.
+        Hyperscan cannot report capture groups, which is why it acts as a
+        prefilter rather than replacing re outright.
+        """
+        copyright_input = copyright_text if copyright_text is not None else text
+        inputs = (copyright_input, copyright_input, text, text)
+
+        db = self._hyperscan_db()
+        if db is None:
+            matches = {i: _SCAN_PATTERNS[i].findall(inputs[i]) for i in (0, 1, 2)}
+            matches[3] = _find_phones(text)
+            return matches
+
+        hit_ids = set()
+
+        def on_match(pattern_id, start, end, flags, context):
+            hit_ids.add(pattern_id)
+
+        db.scan(text.encode(), match_event_handler=on_match)
+        return {
+            0: _SCAN_PATTERNS[0].findall(inputs[0]) if 0 in hit_ids else [],
+            1: _SCAN_PATTERNS[1].findall(inputs[1]) if 1 in hit_ids else [],
+            2: _SCAN_PATTERNS[2].findall(inputs[2]) if 2 in hit_ids else [],
+            3: _find_phones(text) if 3 in hit_ids else []
+        }
+
     def __init__(self):
         self.corporate_suffixes = [
-            'Inc', 'Corp', 'LLC', 'Ltd', 'GmbH', 'AG', 'SA', 'SAS', 
-            'SpA', 'BV', 'NV', 'Pty', 'PLC', 'SE', 'Limited', 
+            'Inc', 'Corp', 'LLC', 'Ltd', 'GmbH', 'AG', 'SA', 'SAS',
+            'SpA', 'BV', 'NV', 'Pty', 'PLC', 'SE', 'Limited',
             'Corporation', 'Company', 'Incorporated'
         ]
+        # Lowercased once so suffix checks are a single C-level
+        # endswith(tuple) call instead of a Python loop per entity
+        lowered = tuple(s.lower() for s in self.corporate_suffixes)
+        self._suffix_tuple = lowered + tuple(f'{s}.' for s in lowered)
         
     def extract_from_html(self, html_content: str, domain: str) -> Dict[str, Any]:
         """Extract structured data from HTML without LLM calls"""
-        soup = BeautifulSoup(html_content, 'lxml')
-        
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
+        # selectolax (MyHTML) parses and traverses without wrapping every
+        # node in a Python object the way BeautifulSoup does
+        tree = HTMLParser(html_content)
         
         result = {
             'domain': domain,
@@ -79,35 +273,43 @@ class EntityExtractor:
             'emails': [],
             'phones': []
         }
+
+        # Track entities as they're appended so duplicates never hit the
+        # list - on entity-heavy pages this avoids growing a list only for
+        # a final dedup pass to throw most of it away
+        seen = set()
+
+        def add_entity(entity):
+            if entity and entity not in seen:
+                seen.add(entity)
+                result['entities'].append(entity)
         
         # Extract title
-        title_tag = soup.find('title')
+        title_tag = tree.css_first('title')
         if title_tag:
-            result['title'] = title_tag.get_text().strip()
+            result['title'] = title_tag.text().strip()
             # Try to extract entity from title
-            entity = self._clean_title_entity(result['title'])
-            if entity:
-                result['entities'].append(entity)
+            add_entity(_clean_title_entity(result['title']))
         
         # Extract meta tags
-        for meta in soup.find_all('meta'):
-            name = meta.get('name') or meta.get('property')
-            content = meta.get('content')
+        for meta in tree.css('meta'):
+            name = meta.attributes.get('name') or meta.attributes.get('property')
+            content = meta.attributes.get('content')
             if name and content:
                 result['meta_tags'][name] = content
                 
                 # Extract entity from og:site_name
                 if name == 'og:site_name':
-                    entity = self._clean_entity_name(content)
+                    entity = _clean_entity_name(content)
                     if entity:
-                        result['entities'].append(entity)
+                        add_entity(entity)
                         if not result['primary_entity']:
                             result['primary_entity'] = entity
         
-        # Extract JSON-LD structured data
-        for script in soup.find_all('script', type='application/ld+json'):
+        # Extract JSON-LD structured data (before script tags are stripped)
+        for script in tree.css('script[type="application/ld+json"]'):
             try:
-                data = json.loads(script.string)
+                data = orjson.loads(script.text())
                 result['structured_data'].append(data)
                 
                 # Extract organization name
@@ -115,39 +317,41 @@ class EntityExtractor:
                     if data.get('@type') == 'Organization':
                         name = data.get('name')
                         if name:
-                            result['entities'].append(name)
+                            add_entity(name)
                             if not result['company_name']:
                                 result['company_name'] = name
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 pass
         
+        # One scan pass covers copyright notices, emails, and phones
+        tree.strip_tags(['script', 'style'])
+        body = tree.body
+        text = body.text(separator=' ') if body else ''
+
+        # Copyright notices live in the footer (or failing that, the last
+        # few KB of visible text) - no need to regex the whole document
+        footer_nodes = tree.css('footer') or tree.css('[class*="copyright"]')
+        if footer_nodes:
+            copyright_text = ' '.join(node.text(separator=' ') for node in footer_nodes)
+        else:
+            copyright_text = text[-4096:]
+
+        scan_matches = self._scan_text(text, copyright_text)
+
         # Extract from copyright notices
-        text = soup.get_text()
-        copyright_patterns = [
-            r'(?:©|Copyright)\s+(?:\d{4}\s+)?([A-Z][A-Za-z0-9\s&.,\'-]+?)(?:\.|,|\s+All|\s+Rights)',
-            r'©\s*(\d{4})?\s*([A-Z][A-Za-z0-9\s&.,\'-]+?)(?:\.|,|\s|$)'
-        ]
-        
-        for pattern in copyright_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            for match in matches:
+        for pattern_id in (0, 1):
+            for match in scan_matches[pattern_id]:
                 entity = match[1] if isinstance(match, tuple) else match
-                entity = self._clean_entity_name(entity)
+                entity = _clean_entity_name(entity)
                 if entity and len(entity) > 2:
-                    result['entities'].append(entity)
+                    add_entity(entity)
         
-        # Extract emails
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        emails = re.findall(email_pattern, text)
-        result['emails'] = list(set(emails))[:5]  # Limit to 5 unique emails
+        # Extract emails (dict.fromkeys dedups in first-seen order, so
+        # output is deterministic instead of hash-randomized)
+        result['emails'] = list(dict.fromkeys(scan_matches[2]))[:5]  # Limit to 5 unique emails
         
         # Extract phone numbers
-        phone_pattern = r'[\+]?[(]?[0-9]{1,3}[)]?[-\s\.]?[(]?[0-9]{1,3}[)]?[-\s\.]?[0-9]{3,4}[-\s\.]?[0-9]{3,4}'
-        phones = re.findall(phone_pattern, text)
-        result['phones'] = list(set(phones))[:5]  # Limit to 5 unique phones
-        
-        # Deduplicate and clean entities
-        result['entities'] = list(set(filter(None, result['entities'])))
+        result['phones'] = list(dict.fromkeys(scan_matches[3]))[:5]  # Limit to 5 unique phones
         
         # Set primary entity if not already set
         if not result['primary_entity'] and result['entities']:
@@ -163,77 +367,59 @@ class EntityExtractor:
         
         return result
     
-    def _clean_title_entity(self, title: str) -> Optional[str]:
-        """Extract entity name from page title"""
-        if not title:
-            return None
-            
-        # Remove common separators and everything after
-        cleaned = re.split(r'\s*[\|–\-:]\s*', title)[0]
-        
-        # Remove common prefixes
-        prefixes = ['Welcome to', 'Home', 'About', 'Official Website of']
-        for prefix in prefixes:
-            if cleaned.lower().startswith(prefix.lower()):
-                cleaned = cleaned[len(prefix):].strip()
-        
-        # Remove marketing terms
-        marketing_terms = ['Services', 'Solutions', 'Products', 'Website']
-        for term in marketing_terms:
-            cleaned = re.sub(f'\\s+{term}\\s*$', '', cleaned, flags=re.IGNORECASE)
-        
-        return cleaned if len(cleaned) > 2 else None
-    
-    def _clean_entity_name(self, name: str) -> Optional[str]:
-        """Clean and validate entity name"""
-        if not name:
-            return None
-            
-        # Remove extra whitespace
-        name = ' '.join(name.split())
-        
-        # Remove trailing punctuation
-        name = re.sub(r'[.,;!?]+$', '', name)
-        
-        # Check if it's too long (likely a sentence)
-        if len(name) > 100:
-            return None
-            
-        # Check if it's too short
-        if len(name) < 3:
-            return None
-            
-        return name
-    
     def _has_corporate_suffix(self, name: str) -> bool:
         """Check if name has a corporate suffix"""
-        name_lower = name.lower()
-        for suffix in self.corporate_suffixes:
-            if name_lower.endswith(suffix.lower()) or name_lower.endswith(f'{suffix.lower()}.'):
-                return True
-        return False
+        return name.lower().endswith(self._suffix_tuple)
+
+# Per-worker extractor singleton so each pool process compiles its
+# Hyperscan database and suffix tuple once
+_worker_extractor = None
+
+def _extract(html_content: str, domain: str) -> Dict[str, Any]:
+    """Run entity extraction in a pool worker (module-level so it pickles)"""
+    global _worker_extractor
+    if _worker_extractor is None:
+        _worker_extractor = EntityExtractor()
+    return _worker_extractor.extract_from_html(html_content, domain)
+
+async def _init_connection(conn):
+    """Register orjson as the jsonb codec on each pooled connection
+
+    jsonb columns then arrive as dicts decoded by orjson and dicts are
+    encoded on the way in, so call sites never touch json strings. Binary
+    format (the wire value is a 0x01 version byte plus the JSON text) so
+    the codec also serves copy_records_to_table - binary COPY refuses
+    columns whose codec is text-format, which would fail every result
+    flush.
+    """
+    await conn.set_type_codec(
+        'jsonb',
+        encoder=lambda value: b'\x01' + orjson.dumps(value),
+        decoder=lambda value: orjson.loads(value[1:]),
+        schema='pg_catalog',
+        format='binary'
+    )
 
 async def init_db():
-    """Initialize database connection pool"""
+    """Initialize the shared database connection pool"""
     global db_pool
-    DATABASE_URL = os.getenv("DATABASE_URL")
-    if DATABASE_URL:
-        db_pool = await asyncpg.create_pool(DATABASE_URL, min_size=2, max_size=10)
-        logger.info("Database pool created")
+    if os.getenv("DATABASE_URL"):
+        db_pool = await get_pool(init=_init_connection)
+        logger.info("Database pool ready")
+
+TABLE_MAP = {
+    'crawlee_dump': 'crawlee_dumps',
+    'scrapy_crawl': 'scrapy_crawls',
+    'playwright_dump': 'playwright_dumps',
+    'axios_cheerio_dump': 'axios_cheerio_dumps'
+}
 
 async def get_dump_data(source_type: str, source_id: int) -> Optional[Dict]:
     """Retrieve dump data from database"""
     if not db_pool:
         return None
     
-    table_map = {
-        'crawlee_dump': 'crawlee_dumps',
-        'scrapy_crawl': 'scrapy_crawls',
-        'playwright_dump': 'playwright_dumps',
-        'axios_cheerio_dump': 'axios_cheerio_dumps'
-    }
-    
-    table = table_map.get(source_type)
+    table = TABLE_MAP.get(source_type)
     if not table:
         return None
     
@@ -278,7 +464,7 @@ async def save_processing_result(
             source_type, source_id, domain,
             extracted_data.get('text', '')[:5000],  # Truncate text
             100,  # Processing time
-            json.dumps(extracted_data),
+            extracted_data,
             'fastapi_extractor',
             50,
             extracted_data.get('primary_entity'),
@@ -287,7 +473,89 @@ async def save_processing_result(
         
         return result['id']
 
-async def process_dump_async(source_type: str, source_id: int):
+def _result_record(
+    source_type: str,
+    source_id: int,
+    domain: str,
+    extracted_data: Dict
+) -> tuple:
+    """Build a processing-result tuple in RESULT_COLUMNS order"""
+    now = datetime.utcnow()
+    return (
+        source_type, source_id, domain,
+        extracted_data.get('text', '')[:5000],  # Truncate text
+        100,  # Processing time
+        extracted_data,
+        'fastapi_extractor',
+        50,
+        extracted_data.get('primary_entity'),
+        0.95 if extracted_data.get('primary_entity') else 0.0,
+        'completed', now, now
+    )
+
+# Per-row fallback INSERT matching RESULT_COLUMNS, used when COPY rejects
+# a batch so one bad record can only lose itself, not its whole batch
+_RESULT_INSERT_SQL = f"""
+    INSERT INTO beta_v2_processing_results ({', '.join(RESULT_COLUMNS)})
+    VALUES ({', '.join(f'${i + 1}' for i in range(len(RESULT_COLUMNS)))})
+"""
+
+async def flush_results(records: List[tuple]):
+    """Write a batch of processing results in one COPY round-trip
+
+    If COPY fails - one malformed record aborts the whole command - the
+    batch falls back to individual INSERTs so the failure stays scoped to
+    the offending rows, matching the durability of the old per-INSERT
+    path.
+    """
+    if not records or not db_pool:
+        return
+
+    async with db_pool.acquire() as conn:
+        try:
+            await conn.copy_records_to_table(
+                'beta_v2_processing_results',
+                records=records,
+                columns=RESULT_COLUMNS
+            )
+        except Exception as copy_error:
+            logger.error(f"COPY flush failed, retrying rows individually: {copy_error}")
+            failed = 0
+            for record in records:
+                try:
+                    await conn.execute(_RESULT_INSERT_SQL, *record)
+                except Exception as row_error:
+                    failed += 1
+                    logger.error(f"Dropping processing result for {record[2]}: {row_error}")
+            logger.info(f"Row-by-row fallback flushed {len(records) - failed}/{len(records)} results")
+            return
+
+    logger.info(f"Flushed {len(records)} processing results via COPY")
+
+async def result_flush_worker():
+    """Drain the result queue in batches of up to RESULT_FLUSH_MAX_ROWS
+    or RESULT_FLUSH_INTERVAL seconds, whichever fills first. COPY collapses
+    N insert round-trips and parse/plan cycles into one.
+    """
+    while True:
+        records = [await result_queue.get()]
+        deadline = asyncio.get_event_loop().time() + RESULT_FLUSH_INTERVAL
+
+        while len(records) < RESULT_FLUSH_MAX_ROWS:
+            remaining = deadline - asyncio.get_event_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                records.append(await asyncio.wait_for(result_queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+
+        try:
+            await flush_results(records)
+        except Exception as e:
+            logger.error(f"Error flushing processing results: {e}")
+
+async def process_dump_async(source_type: str, source_id: int, priority: str = "normal"):
     """Process a dump asynchronously"""
     try:
         logger.info(f"Processing {source_type}:{source_id}")
@@ -298,53 +566,125 @@ async def process_dump_async(source_type: str, source_id: int):
             logger.error(f"Dump not found: {source_type}:{source_id}")
             return
         
+        await process_fetched_dump(source_type, source_id, dump_data, priority)
+        
+    except Exception as e:
+        logger.error(f"Error processing dump: {e}")
+
+async def process_fetched_dump(source_type: str, source_id: int, dump_data: Dict, priority: str = "normal"):
+    """Extract entities from an already-fetched dump row and save the result"""
+    try:
         # Extract HTML content based on source type
         html_content = None
         domain = dump_data.get('domain', '')
         
+        # dump_data is jsonb (migration 0008) and the pool codec decodes it
+        # to a dict, so no string branch is needed
         if source_type == 'crawlee_dump':
-            dump_json = dump_data.get('dump_data', {})
-            if isinstance(dump_json, str):
-                dump_json = json.loads(dump_json)
+            dump_json = dump_data.get('dump_data') or {}
             pages = dump_json.get('pages', [])
             if pages:
                 html_content = pages[0].get('html', '')
         elif source_type == 'axios_cheerio_dump':
-            dump_json = dump_data.get('dump_data', {})
-            if isinstance(dump_json, str):
-                dump_json = json.loads(dump_json)
+            dump_json = dump_data.get('dump_data') or {}
             html_content = dump_json.get('html', '')
         
         if not html_content:
             logger.error(f"No HTML content found in dump: {source_type}:{source_id}")
             return
         
-        # Extract entities and data
-        extractor = EntityExtractor()
-        extracted_data = extractor.extract_from_html(html_content, domain)
+        # Extract entities and data - off the event loop so parsing one
+        # large page doesn't stall every other dump and DB acquire
+        if process_pool:
+            loop = asyncio.get_event_loop()
+            extracted_data = await loop.run_in_executor(
+                process_pool, _extract, html_content, domain
+            )
+        else:
+            extracted_data = _extract(html_content, domain)
         
         logger.info(f"Extracted data for {domain}: {extracted_data.get('primary_entity')}")
         
-        # Save to database
-        processing_id = await save_processing_result(
-            source_type, source_id, domain, extracted_data
-        )
-        
-        logger.info(f"Saved processing result: {processing_id}")
+        # Save to database - high priority dumps keep the single INSERT so
+        # the RETURNING id is available immediately; everything else goes
+        # through the batching queue and is flushed via COPY
+        if priority == 'high' or result_queue is None:
+            processing_id = await save_processing_result(
+                source_type, source_id, domain, extracted_data
+            )
+            logger.info(f"Saved processing result: {processing_id}")
+        else:
+            await result_queue.put(
+                _result_record(source_type, source_id, domain, extracted_data)
+            )
         
     except Exception as e:
         logger.error(f"Error processing dump: {e}")
 
+async def process_dumps_batch_async(requests: List[tuple]):
+    """Fetch dump rows in bulk and process them concurrently
+
+    One ANY($1::int[]) query per source_type replaces a round trip per
+    dump; extraction then fans out through asyncio.gather, with the CPU
+    work already offloaded to the process pool by process_fetched_dump.
+    """
+    if not db_pool:
+        logger.error("Database not connected")
+        return
+
+    ids_by_type = defaultdict(list)
+    priorities = {}
+    for source_type, source_id, priority in requests:
+        ids_by_type[source_type].append(source_id)
+        priorities[(source_type, source_id)] = priority
+
+    tasks = []
+    async with db_pool.acquire() as conn:
+        for source_type, ids in ids_by_type.items():
+            table = TABLE_MAP.get(source_type)
+            if not table:
+                continue
+            rows = await conn.fetch(
+                f"SELECT * FROM {table} WHERE id = ANY($1::int[])",
+                ids
+            )
+            for row in rows:
+                dump_data = dict(row)
+                tasks.append(process_fetched_dump(
+                    source_type,
+                    dump_data['id'],
+                    dump_data,
+                    priorities.get((source_type, dump_data['id']), 'normal')
+                ))
+
+    await asyncio.gather(*tasks)
+
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database on startup"""
+    """Initialize database, extraction pool, and result-flush worker on startup"""
+    global result_queue, result_flush_task, process_pool
     await init_db()
+    process_pool = concurrent.futures.ProcessPoolExecutor(max_workers=os.cpu_count())
+    result_queue = asyncio.Queue()
+    result_flush_task = asyncio.create_task(result_flush_worker())
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Close database pool on shutdown"""
+    """Flush pending results and close database pool on shutdown"""
+    if result_flush_task:
+        result_flush_task.cancel()
+    if result_queue and not result_queue.empty():
+        pending = []
+        while not result_queue.empty():
+            pending.append(result_queue.get_nowait())
+        try:
+            await flush_results(pending)
+        except Exception as e:
+            logger.error(f"Error flushing pending results on shutdown: {e}")
     if db_pool:
-        await db_pool.close()
+        await close_pool()
+    if process_pool:
+        process_pool.shutdown(wait=False)
 
 @app.get("/health")
 async def health_check():
@@ -363,7 +703,8 @@ async def process_dump(request: ProcessRequest, background_tasks: BackgroundTask
     background_tasks.add_task(
         process_dump_async,
         request.source_type,
-        request.source_id
+        request.source_id,
+        request.priority
     )
     
     return ProcessingResponse(
@@ -372,6 +713,25 @@ async def process_dump(request: ProcessRequest, background_tasks: BackgroundTask
         message=f"Processing started for {request.source_type}:{request.source_id}"
     )
 
+@app.post("/process/batch", response_model=ProcessingResponse)
+async def process_dump_batch(requests: List[ProcessRequest], background_tasks: BackgroundTasks):
+    """Process a batch of dumps with one bulk fetch per source type"""
+    
+    # Validate request
+    for request in requests:
+        if request.source_type not in TABLE_MAP:
+            raise HTTPException(status_code=400, detail=f"Invalid source type: {request.source_type}")
+    
+    background_tasks.add_task(
+        process_dumps_batch_async,
+        [(r.source_type, r.source_id, r.priority) for r in requests]
+    )
+    
+    return ProcessingResponse(
+        success=True,
+        message=f"Processing started for {len(requests)} dumps"
+    )
+
 @app.get("/status/{source_type}/{source_id}")
 async def get_processing_status(source_type: str, source_id: int):
     """Get processing status for a specific dump"""
@@ -1,15 +1,199 @@
 
 #!/usr/bin/env python3
+import asyncio
 import json
 import sys
 import os
 import re
+import tempfile
 import time
 from typing import Dict, List, Any
 import google.generativeai as genai
+from pydantic import BaseModel
+
+# selectolax is optional - the regex strip below covers environments
+# without the native wheel
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:
+    HTMLParser = None
+
+# pyahocorasick is optional - position lookup falls back to str.find
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# hyperscan is optional - the suffix scan falls back to plain re
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+# Compiled once at import - these run per document, and re's internal cache
+# pays a pattern-string lookup (and can thrash) on every call otherwise
+_HTML_TAG_RE = re.compile(r'<[^>]*>')
+_WS_RE = re.compile(r'\s+')
+# Anchored trim of the registrable suffix (compound forms first so
+# example.co.uk loses .co.uk, not just .uk)
+_TLD_RE = re.compile(r'\.(?:co\.uk|com\.au|co\.in|com|in|org|net|io|co|ai|uk|de|fr)$', re.IGNORECASE)
+# One alternation covers all three suffix families, so the (up to 10k char)
+# text is traversed once instead of three times and the engine shares the
+# common [A-Z]... prefix across alternatives
+_ALL_SUFFIX_RE = re.compile(
+    r'\b([A-Z][A-Za-z0-9\s&\.\-]+\s+(?:Limited|Ltd\.?|Inc\.?|Incorporated|LLC|L\.L\.C\.|Corp\.?|Corporation'
+    r'|Private\s+Limited|Pvt\.?\s+Ltd\.?|Public\s+Limited\s+Company|PLC'
+    r'|GmbH|S\.A\.|B\.V\.|AG|AB|AS|S\.p\.A\.))\b',
+    re.IGNORECASE
+)
+
+# Hyperscan prefilter for the suffix scan - a single SIMD DFA pass answers
+# "does any legal suffix appear at all?" so suffix-free documents skip the
+# backtracking finditer entirely. Hyperscan can't report capture groups,
+# which is why re still extracts the actual entity names on a hit.
+_hs_suffix_db = None
+_hs_suffix_failed = False
+
+def _suffix_prefilter_hit(text: str) -> bool:
+    """True when the text may contain a legal suffix (or hyperscan is out)"""
+    global _hs_suffix_db, _hs_suffix_failed
+    if hyperscan is None or _hs_suffix_failed:
+        return True
+    if _hs_suffix_db is None:
+        try:
+            db = hyperscan.Database()
+            db.compile(
+                expressions=[_ALL_SUFFIX_RE.pattern.encode()],
+                ids=[0],
+                flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_PREFILTER | hyperscan.HS_FLAG_SINGLEMATCH]
+            )
+            _hs_suffix_db = db
+        except Exception as e:
+            print(f"[LangExtract] Hyperscan unavailable, using re only: {e}", file=sys.stderr)
+            _hs_suffix_failed = True
+            return True
+    hit = False
+    def on_match(pat_id, start, end, flags, context):
+        nonlocal hit
+        hit = True
+    _hs_suffix_db.scan(text.encode('utf-8', 'ignore'), match_event_handler=on_match)
+    return hit
+
+# GenerativeModel instances keyed by model name - genai.configure and model
+# construction run once per process, not once per LangExtractService; every
+# service (worker loop, FastAPI wrapper) shares the warm clients
+_MODELS: Dict[str, Any] = {}
+
+class Extraction(BaseModel):
+    """One extracted field value, mirroring the RESPONSE FORMAT block
+
+    Flat list entries with an explicit field name rather than a dict keyed
+    by field: Gemini's structured-output schema subset cannot express maps
+    with dynamic keys, so the map shape would be rejected at request build.
+    Every field is required - defaults make Pydantic emit "default" keys
+    the SDK's protos.Schema conversion rejects; fallback values for sparse
+    responses live in _assemble_result instead.
+    """
+    field: str
+    value: str
+    confidence: int
+    context: str
+    extraction_method: str
+
+class ExtractionResult(BaseModel):
+    extractions: List[Extraction]
+
+def _extract_json_block(text: str):
+    """Return the first top-level {...} block in text, or None
+
+    Single O(n) pass tracking brace depth with string literals and escapes
+    skipped. The old {.*} DOTALL regex scanned to the last brace in the
+    response, backtracked on malformed output, and could capture trailing
+    garbage that then failed json.loads.
+    """
+    start = text.find('{')
+    if start == -1:
+        return None
+
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        c = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif c == '\\':
+                escaped = True
+            elif c == '"':
+                in_string = False
+            continue
+        if c == '"':
+            in_string = True
+        elif c == '{':
+            depth += 1
+        elif c == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return None
+
+def _find_positions(text: str, values) -> Dict[str, int]:
+    """First offset of each value in text in one pass over the text
+
+    With N extracted entities, per-entity text.find(value) rescans the
+    document N times (O(N*M)). An Aho-Corasick automaton over all values
+    finds every first occurrence in a single streaming pass; without
+    pyahocorasick we fall back to the per-value find.
+    """
+    values = [v for v in values if v]
+    if ahocorasick is None or len(values) < 2:
+        return {v: text.find(v) for v in values}
+
+    automaton = ahocorasick.Automaton()
+    for v in values:
+        automaton.add_word(v, v)
+    automaton.make_automaton()
+
+    positions = {v: -1 for v in values}
+    remaining = len(values)
+    for end, v in automaton.iter(text):
+        if positions[v] == -1:
+            positions[v] = end - len(v) + 1
+            remaining -= 1
+            if remaining == 0:
+                break
+    return positions
 
 class LangExtractService:
-    def __init__(self, model_name='gemini-2.5-flash'):
+    def __init__(self, model_name='gemini-2.5-flash', max_concurrent_requests=8, tokens_per_minute=1000000):
+        # JSON mode constrained to ExtractionResult - the decoder can only
+        # emit the response shape, so parsing is a straight load with the
+        # free-text extraction path kept only as a fallback
+        self._generation_config = genai.GenerationConfig(
+            response_mime_type="application/json",
+            response_schema=ExtractionResult
+        )
+        # Concurrency knobs for the async path - the semaphore caps in-flight
+        # requests and the token bucket stays under the tier's TPM ceiling
+        self.max_concurrent_requests = max_concurrent_requests
+        self.tokens_per_minute = tokens_per_minute
+        self._semaphore = None  # created lazily inside the running loop
+        self._bucket_lock = None
+        self._bucket_tokens = float(tokens_per_minute)
+        self._bucket_updated = time.monotonic()
+        self._aio_client = None
+
+        # Cached-content models keyed by schema - the static prompt preamble
+        # is uploaded once and billed at the cached-prefix discount
+        self._prompt_caches = {}
+        # Rendered static preambles keyed by schema - the ~40-line rules and
+        # examples block is rebuilt only on the first request per schema
+        self._preamble_cache = {}
+        # Models carrying the preamble as system_instruction, keyed by
+        # schema - per-call contents shrink to just the document tail
+        self._system_models = {}
+
         # Initialize Gemini with API key
         api_key = os.environ.get('GEMINI_API_KEY')
         if not api_key:
@@ -17,113 +201,132 @@ class LangExtractService:
             self.model = None
             self.model_name = model_name
             return
-        
+
         try:
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel(model_name)
+            model = _MODELS.get(model_name)
+            if model is None:
+                genai.configure(api_key=api_key)
+                model = genai.GenerativeModel(model_name)
+                _MODELS[model_name] = model
+                print(f"{model_name} API initialized successfully", file=sys.stderr)
+            self.model = model
             self.model_name = model_name
-            print(f"{model_name} API initialized successfully", file=sys.stderr)
         except Exception as e:
             print(f"Error initializing {model_name} API: {e}", file=sys.stderr)
             self.model = None
             self.model_name = model_name
-    
-    def extract_entities(self, html_content: str, schema: Dict[str, str], domain: str = None) -> Dict[str, Any]:
-        """Extract entities using Gemini API"""
-        try:
-            start_time = time.time()
-            
-            # Strip HTML tags to get clean text
-            text_content = re.sub(r'<[^>]*>', ' ', html_content)
-            text_content = re.sub(r'\s+', ' ', text_content).strip()
-            
-            # Pre-process to find legal entities with suffixes (capture full name)
-            legal_suffixes = [
-                r'\b([A-Z][A-Za-z0-9\s&\.\-]+\s+(?:Limited|Ltd\.?|Inc\.?|Incorporated|LLC|L\.L\.C\.|Corp\.?|Corporation))\b',
-                r'\b([A-Z][A-Za-z0-9\s&\.\-]+\s+(?:Private\s+Limited|Pvt\.?\s+Ltd\.?|Public\s+Limited\s+Company|PLC))\b',
-                r'\b([A-Z][A-Za-z0-9\s&\.\-]+\s+(?:GmbH|S\.A\.|B\.V\.|AG|AB|AS|S\.p\.A\.))\b'
-            ]
-            
-            found_entities = []
-            for pattern in legal_suffixes:
-                matches = re.findall(pattern, text_content, re.IGNORECASE)
-                found_entities.extend(matches)
-            
-            # Add hint about found entities to the beginning of text
-            if found_entities:
-                # Remove duplicates and limit to first 10 entities
-                unique_entities = list(set(found_entities))[:10]
-                
-                # Extract domain name for prioritization hint
-                domain_hint = ""
-                if domain:
-                    domain_name = domain.replace('.com', '').replace('.in', '').replace('.org', '').replace('.net', '')
-                    domain_hint = f"[DOMAIN: {domain_name}] "
-                
-                entity_hint = f"{domain_hint}[LEGAL ENTITIES FOUND: {', '.join(unique_entities)}] "
+
+    def _prepare_text(self, html_content: str, domain: str = None) -> str:
+        """Strip HTML, hint found legal entities, and cap length"""
+        # Strip HTML to clean text. The C parser drops script/style bodies
+        # entirely - the regex strip leaves them inline as text noise the
+        # LLM then pays tokens for, crowding real content out of the 10k
+        # cap. header/footer stay: copyright notices live there and the
+        # prompt explicitly points the model at them.
+        if HTMLParser is not None:
+            tree = HTMLParser(html_content)
+            for tag in tree.css('script,style,noscript,iframe,form'):
+                tag.decompose()
+            text_content = tree.body.text(separator=' ') if tree.body else ''
+        else:
+            text_content = _HTML_TAG_RE.sub(' ', html_content)
+        # Truncate before the regex passes - normalizing and suffix-scanning
+        # text the prompt will never send is pure waste. 12k leaves headroom
+        # over the 5k prompt slice for the suffix scan to catch entities that
+        # whitespace collapsing pulls forward.
+        text_content = _WS_RE.sub(' ', text_content[:12000]).strip()
+
+        # Pre-process to find legal entities with suffixes (capture full
+        # name). finditer with an early exit stops the scan as soon as 10
+        # distinct entities are seen, instead of findall materializing every
+        # match only for the slice below to throw most of them away - and
+        # text order is preserved, so top-of-document entities (most likely
+        # the domain owner) lead the hint.
+        unique_entities = []
+        if _suffix_prefilter_hit(text_content):
+            seen = set()
+            for m in _ALL_SUFFIX_RE.finditer(text_content):
+                v = m.group(1)
+                if v not in seen:
+                    seen.add(v)
+                    unique_entities.append(v)
+                    if len(unique_entities) == 10:
+                        break
+
+        # Add hint about found entities to the beginning of text
+        if unique_entities:
+
+            # Extract domain name for prioritization hint
+            domain_hint = ""
+            if domain:
+                domain_name = _TLD_RE.sub('', domain)
+                domain_hint = f"[DOMAIN: {domain_name}] "
+
+            entity_hint = f"{domain_hint}[LEGAL ENTITIES FOUND: {', '.join(unique_entities)}] "
+            text_content = entity_hint + text_content
+
+            # Add count if many entities found
+            if len(unique_entities) > 5:
+                entity_hint = f"{domain_hint}[{len(unique_entities)} LEGAL ENTITIES FOUND: {', '.join(unique_entities)}] "
                 text_content = entity_hint + text_content
-                
-                # Add count if many entities found
-                if len(unique_entities) > 5:
-                    entity_hint = f"{domain_hint}[{len(unique_entities)} LEGAL ENTITIES FOUND: {', '.join(unique_entities)}] "
-                    text_content = entity_hint + text_content
-            
-            # Limit text length for demo
-            if len(text_content) > 10000:
-                text_content = text_content[:10000]
-            
-            if not self.model:
-                return {
-                    "error": "Gemini API key not configured",
-                    "entities": [],
-                    "processingTime": 0,
-                    "tokensProcessed": 0,
-                    "sourceMapping": [],
-                    "metadata": {}
-                }
-            
-            # Create LangExtract-style prompt description
-            prompt_description = f"""Extract structured legal entity information from the following text.
+
+        # Cap at what the prompt tail actually sends, so position lookups in
+        # _assemble_result run against exactly the text the model saw
+        return text_content[:5000]
+
+    def _build_prompt_static(self, schema: Dict[str, str]) -> str:
+        """Schema-dependent but document-independent prompt preamble
+
+        Deliberately free of the domain and text so every request with the
+        same schema shares it verbatim - that's what makes it cacheable as
+        Gemini context. Memoized per schema: the joins and f-strings below
+        produce the same string on every call for a given schema.
+        """
+        key = frozenset(schema.items())
+        cached = self._preamble_cache.get(key)
+        if cached is not None:
+            return cached
+        prompt_description = """Extract structured legal entity information from the text provided after the rules.
 Use exact text for extractions. Do not paraphrase or overlap entities.
 Focus on complete legal entity names with their proper suffixes.
-For domain {domain or 'unknown'}, prioritize entities that match the domain ownership."""
-
-            # Create schema-based examples (simplified for demonstration)
-            schema_fields = list(schema.keys())
-            
-            # Generate examples based on schema type
-            if 'legal_entity_name' in schema_fields:
-                example_text = "Copyright © 2024 Apple Inc. All rights reserved. Apple Inc. is a multinational technology company."
-                example_extractions = [
-                    {
-                        "extraction_class": "legal_entity_name",
-                        "extraction_text": "Apple Inc.",
-                        "attributes": {"confidence": 95, "source": "copyright_notice"}
-                    }
-                ]
-            elif 'company_name' in schema_fields:
-                example_text = "Welcome to Microsoft Corporation. Microsoft Corporation provides cloud services."
-                example_extractions = [
-                    {
-                        "extraction_class": "company_name", 
-                        "extraction_text": "Microsoft Corporation",
-                        "attributes": {"confidence": 90, "legal_suffix": "Corporation"}
-                    }
-                ]
-            else:
-                # Generic example for other schemas
-                example_text = "Contact Meta Platforms, Inc. for more information about our services."
-                example_extractions = []
-                for field in schema_fields[:2]:  # Limit to first 2 fields for example
-                    if 'name' in field.lower() or 'entity' in field.lower():
-                        example_extractions.append({
-                            "extraction_class": field,
-                            "extraction_text": "Meta Platforms, Inc.",
-                            "attributes": {"confidence": 85}
-                        })
-
-            # Build the structured prompt following LangExtract patterns
-            prompt = f"""Extract structured information using the following schema and examples as guidance.
+Prioritize entities that match the ownership of the domain given in the DOMAIN CONTEXT line."""
+
+        # Create schema-based examples (simplified for demonstration)
+        schema_fields = list(schema.keys())
+
+        # Generate examples based on schema type
+        if 'legal_entity_name' in schema_fields:
+            example_text = "Copyright © 2024 Apple Inc. All rights reserved. Apple Inc. is a multinational technology company."
+            example_extractions = [
+                {
+                    "extraction_class": "legal_entity_name",
+                    "extraction_text": "Apple Inc.",
+                    "attributes": {"confidence": 95, "source": "copyright_notice"}
+                }
+            ]
+        elif 'company_name' in schema_fields:
+            example_text = "Welcome to Microsoft Corporation. Microsoft Corporation provides cloud services."
+            example_extractions = [
+                {
+                    "extraction_class": "company_name",
+                    "extraction_text": "Microsoft Corporation",
+                    "attributes": {"confidence": 90, "legal_suffix": "Corporation"}
+                }
+            ]
+        else:
+            # Generic example for other schemas
+            example_text = "Contact Meta Platforms, Inc. for more information about our services."
+            example_extractions = []
+            for field in schema_fields[:2]:  # Limit to first 2 fields for example
+                if 'name' in field.lower() or 'entity' in field.lower():
+                    example_extractions.append({
+                        "extraction_class": field,
+                        "extraction_text": "Meta Platforms, Inc.",
+                        "attributes": {"confidence": 85}
+                    })
+
+        # Build the structured prompt following LangExtract patterns
+        preamble = f"""Extract structured information using the following schema and examples as guidance.
 
 EXTRACTION TASK:
 {prompt_description}
@@ -138,39 +341,261 @@ Expected Extractions:
 
 CRITICAL EXTRACTION RULES:
 1. Extract COMPLETE legal entity names with suffixes (Inc., Ltd., LLC, Corp., etc.)
-2. For domain {domain or 'any domain'}: prioritize entities matching domain ownership
+2. Prioritize entities matching the ownership of the DOMAIN CONTEXT domain
 3. Search in: copyright notices, legal disclaimers, about sections, footer information
 4. Use exact text from document - do not paraphrase
 5. For arrays: extract ALL relevant instances, not just the first
-6. Include confidence score (0-100) for each extraction
+6. Include confidence score (0-100) for each extraction"""
+
+        self._preamble_cache[key] = preamble
+        return preamble
+
+    def _build_prompt_tail(self, text_content: str, domain: str = None) -> str:
+        """Per-document prompt tail appended after the (cacheable) preamble"""
+        return f"""DOMAIN CONTEXT: {domain or 'unknown'}
 
 TEXT TO ANALYZE:
 {text_content[:5000]}
 
 RESPONSE FORMAT (JSON only):
 {{
-  "extractions": {{
-    "field_name": {{
+  "extractions": [
+    {{
+      "field": "field_name",
       "value": "extracted text",
       "confidence": 85,
       "context": "surrounding text where found",
       "extraction_method": "copyright_notice|footer|about_section|general"
     }}
-  }}
+  ]
 }}"""
-            
+
+    def _build_prompt(self, text_content: str, schema: Dict[str, str], domain: str = None) -> str:
+        """Build the full LangExtract-style structured prompt"""
+        return self._build_prompt_static(schema) + "\n\n" + self._build_prompt_tail(text_content, domain)
+
+    def _cached_model(self, schema: Dict[str, str]):
+        """Model bound to cached preamble content for this schema, or None
+
+        CachedContent is created once per schema (keyed by its sorted JSON)
+        with a 1h TTL; the cached prefix is billed at a 90% discount and
+        shortens time-to-first-token. Creation failures - e.g. preambles
+        below the model's minimum cacheable token count - are remembered so
+        requests fall back to the inline prompt without retrying.
+        """
+        if not self.model:
+            return None
+
+        key = json.dumps(schema, sort_keys=True)
+        if key in self._prompt_caches:
+            return self._prompt_caches[key]
+
+        try:
+            cached = genai.caching.CachedContent.create(
+                model=self.model_name,
+                contents=[self._build_prompt_static(schema)],
+                ttl="3600s"
+            )
+            model = genai.GenerativeModel.from_cached_content(cached_content=cached)
+            print(f"[LangExtract] Created prompt cache for schema: {cached.name}", file=sys.stderr)
+        except Exception as e:
+            print(f"[LangExtract] Prompt caching unavailable, using inline prompt: {e}", file=sys.stderr)
+            model = None
+
+        self._prompt_caches[key] = model
+        return model
+
+    def _schema_model(self, schema: Dict[str, str]):
+        """GenerativeModel with the static preamble set as system_instruction
+
+        system_instruction travels once per model handle instead of inside
+        every request's contents, so the ~800 tokens of rules and examples
+        stop counting against per-call latency and TPM headroom. One model
+        per schema, built lazily and reused.
+        """
+        key = json.dumps(schema, sort_keys=True)
+        model = self._system_models.get(key)
+        if model is None:
+            model = genai.GenerativeModel(
+                self.model_name,
+                system_instruction=self._build_prompt_static(schema)
+            )
+            self._system_models[key] = model
+        return model
+
+    def _parse_response_json(self, response_text: str) -> Dict[str, Any]:
+        """Extract the JSON payload from a model response"""
+        print(f"[LangExtract] Attempting JSON parsing from response", file=sys.stderr)
+        json_content = _extract_json_block(response_text)
+        if json_content:
+            print(f"[LangExtract] Found JSON block: {len(json_content)} characters", file=sys.stderr)
+            try:
+                result_json = json.loads(json_content)
+                print(f"[LangExtract] Successfully parsed JSON with keys: {list(result_json.keys())}", file=sys.stderr)
+                return result_json
+            except json.JSONDecodeError as je:
+                print(f"[LangExtract] JSON decode error in matched content: {je}", file=sys.stderr)
+                print(f"[LangExtract] Failed JSON content: {json_content[:500]}{'...' if len(json_content) > 500 else ''}", file=sys.stderr)
+                return {"extractions": {}}
+
+        # If no JSON found, try to parse the entire response
+        print(f"[LangExtract] No JSON pattern match, trying full response parse", file=sys.stderr)
+        try:
+            result_json = json.loads(response_text)
+            print(f"[LangExtract] Successfully parsed full response as JSON", file=sys.stderr)
+            return result_json
+        except json.JSONDecodeError as je:
+            print(f"[LangExtract] Full response JSON decode error: {je}", file=sys.stderr)
+            print(f"[LangExtract] Raw response causing error: {response_text[:500]}{'...' if len(response_text) > 500 else ''}", file=sys.stderr)
+            return {"extractions": {}}
+
+    def _assemble_result(self, result_json: Dict[str, Any], text_content: str, start_time: float) -> Dict[str, Any]:
+        """Convert parsed extractions into the service's response format"""
+        entities = []
+        extractions = result_json.get("extractions", {})
+
+        if not extractions:
+            return {
+                "entities": [],
+                "processingTime": int((time.time() - start_time) * 1000),
+                "tokensProcessed": text_content.count(' ') + 1 if text_content else 0,
+                "sourceMapping": [],
+                "metadata": {
+                    "language": "en",
+                    "documentLength": len(text_content),
+                    "chunkCount": 1,
+                    "model": self.model_name
+                }
+            }
+
+        print(f"[LangExtract] Processing extractions of type: {type(extractions)}", file=sys.stderr)
+
+        # The schema-constrained shape is a list of {field, value, ...}
+        # entries; key them by field name. Older dict-of-dicts responses
+        # (and odd free-text shapes) are still converted the lenient way.
+        if isinstance(extractions, list):
+            new_extractions = {}
+            for i, item in enumerate(extractions):
+                if not isinstance(item, dict):
+                    continue
+                if "field" in item and "value" in item:
+                    key = item["field"]
+                    new_extractions[f"{key}_{i}" if key in new_extractions else key] = item
+                else:
+                    print(f"[LangExtract] WARNING: list extraction without field/value keys", file=sys.stderr)
+                    for key, value in item.items():
+                        new_extractions[f"{key}_{i}" if key in new_extractions else key] = value
+            extractions = new_extractions
+
+        # Ensure extractions is a dict
+        if not isinstance(extractions, dict):
+            print(f"[LangExtract] ERROR: extractions is not a dict after conversion: {type(extractions)}", file=sys.stderr)
+            extractions = {}
+
+        # Normalize first, then resolve all positions in one pass over the text
+        normalized = []
+        for field_name, extraction_data in extractions.items():
+            # Handle case where extraction_data might not be a dict
+            if not isinstance(extraction_data, dict):
+                print(f"[LangExtract] WARNING: extraction_data is not a dict: {type(extraction_data)}", file=sys.stderr)
+                # Try to convert string to simple dict
+                if isinstance(extraction_data, str):
+                    extraction_data = {"value": extraction_data, "confidence": 50}
+                else:
+                    continue
+
+            if extraction_data and extraction_data.get("value"):
+                normalized.append((field_name, extraction_data))
+
+        positions = _find_positions(text_content, {data["value"] for _, data in normalized})
+
+        for field_name, extraction_data in normalized:
+            value = extraction_data["value"]
+            start_pos = positions.get(value, -1)
+            end_pos = start_pos + len(value) if start_pos != -1 else -1
+
+            entities.append({
+                "text": value,
+                "type": field_name,
+                "confidence": extraction_data.get("confidence", 50) / 100.0,
+                "sourceLocation": {
+                    "start": start_pos if start_pos != -1 else 0,
+                    "end": end_pos if end_pos != -1 else len(value),
+                    "context": extraction_data.get("context", "")
+                }
+            })
+
+        processing_time = int((time.time() - start_time) * 1000)
+
+        return {
+            "entities": entities,
+            "processingTime": processing_time,
+            # Whitespace count, not .split() - one C-level scan instead of
+            # allocating ~1500 substrings just to take the list's length
+            "tokensProcessed": text_content.count(' ') + 1 if text_content else 0,
+            "sourceMapping": [
+                {
+                    "text": entity["text"],
+                    "originalPosition": entity["sourceLocation"]["start"],
+                    "extractedPosition": i
+                } for i, entity in enumerate(entities)
+            ],
+            "metadata": {
+                "language": "en",
+                "documentLength": len(text_content),
+                "chunkCount": 1,
+                "model": self.model_name
+            }
+        }
+
+    def extract_entities(self, html_content: str, schema: Dict[str, str], domain: str = None) -> Dict[str, Any]:
+        """Extract entities using Gemini API"""
+        try:
+            start_time = time.time()
+
+            # Cheap guards first - no point stripping and regex-scanning the
+            # document when the call can't (or needn't) happen
+            if not self.model:
+                return {
+                    "error": "Gemini API key not configured",
+                    "entities": [],
+                    "processingTime": 0,
+                    "tokensProcessed": 0,
+                    "sourceMapping": [],
+                    "metadata": {}
+                }
+
+            if not html_content or not html_content.strip():
+                return {
+                    "entities": [],
+                    "processingTime": 0,
+                    "tokensProcessed": 0,
+                    "sourceMapping": [],
+                    "metadata": {"model": self.model_name}
+                }
+
+            text_content = self._prepare_text(html_content, domain)
+
+            # With a warm context cache only the per-document tail is sent;
+            # otherwise the rules ride along as system_instruction and the
+            # tail is still all that goes in contents
+            model = self._cached_model(schema)
+            if model is None:
+                model = self._schema_model(schema)
+            prompt = self._build_prompt_tail(text_content, domain)
+
             # Call Gemini API with timeout protection
             api_call_start = time.time()
             print(f"[LangExtract] Starting API call to {self.model_name}", file=sys.stderr)
             print(f"[LangExtract] Prompt length: {len(prompt)} characters", file=sys.stderr)
             print(f"[LangExtract] Text content length: {len(text_content)} characters", file=sys.stderr)
-            
+
             try:
-                response = self.model.generate_content(prompt)
+                response = model.generate_content(prompt, generation_config=self._generation_config)
                 api_call_duration = int((time.time() - api_call_start) * 1000)
-                
+
                 print(f"[LangExtract] API call completed in {api_call_duration}ms", file=sys.stderr)
-                
+
                 if not response:
                     print(f"[LangExtract] ERROR: Null response from {self.model_name}", file=sys.stderr)
                     return {
@@ -181,11 +606,10 @@ RESPONSE FORMAT (JSON only):
                         "sourceMapping": [],
                         "metadata": {"model": self.model_name, "apiCallDuration": api_call_duration}
                     }
-                
+
                 if not hasattr(response, 'text'):
                     print(f"[LangExtract] ERROR: Response missing text attribute from {self.model_name}", file=sys.stderr)
                     print(f"[LangExtract] Response type: {type(response)}", file=sys.stderr)
-                    print(f"[LangExtract] Response attributes: {dir(response)}", file=sys.stderr)
                     return {
                         "error": f"Invalid response structure from {self.model_name}",
                         "entities": [],
@@ -194,48 +618,26 @@ RESPONSE FORMAT (JSON only):
                         "sourceMapping": [],
                         "metadata": {"model": self.model_name, "apiCallDuration": api_call_duration}
                     }
-                
+
                 # Parse the response
                 response_text = response.text
                 print(f"[LangExtract] Response received: {len(response_text)} characters", file=sys.stderr)
                 print(f"[LangExtract] Response preview: {response_text[:200]}{'...' if len(response_text) > 200 else ''}", file=sys.stderr)
-                
-                # Try to extract JSON from response
-                print(f"[LangExtract] Attempting JSON parsing from response", file=sys.stderr)
-                json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-                if json_match:
-                    json_content = json_match.group()
-                    print(f"[LangExtract] Found JSON match: {len(json_content)} characters", file=sys.stderr)
-                    try:
-                        result_json = json.loads(json_content)
-                        print(f"[LangExtract] Successfully parsed JSON with keys: {list(result_json.keys())}", file=sys.stderr)
-                    except json.JSONDecodeError as je:
-                        print(f"[LangExtract] JSON decode error in matched content: {je}", file=sys.stderr)
-                        print(f"[LangExtract] Failed JSON content: {json_content[:500]}{'...' if len(json_content) > 500 else ''}", file=sys.stderr)
-                        result_json = {"extractions": {}}
-                else:
-                    # If no JSON found, try to parse the entire response
-                    print(f"[LangExtract] No JSON pattern match, trying full response parse", file=sys.stderr)
-                    try:
-                        result_json = json.loads(response_text)
-                        print(f"[LangExtract] Successfully parsed full response as JSON", file=sys.stderr)
-                    except json.JSONDecodeError as je:
-                        print(f"[LangExtract] Full response JSON decode error: {je}", file=sys.stderr)
-                        print(f"[LangExtract] Raw response causing error: {response_text[:500]}{'...' if len(response_text) > 500 else ''}", file=sys.stderr)
-                        result_json = {"extractions": {}}
-                        
+
+                result_json = self._parse_response_json(response_text)
+
             except Exception as api_error:
                 api_call_duration = int((time.time() - api_call_start) * 1000)
                 print(f"[LangExtract] CRITICAL ERROR: {self.model_name} API call failed after {api_call_duration}ms", file=sys.stderr)
                 print(f"[LangExtract] Error type: {type(api_error).__name__}", file=sys.stderr)
                 print(f"[LangExtract] Error message: {str(api_error)}", file=sys.stderr)
                 print(f"[LangExtract] Error details: {repr(api_error)}", file=sys.stderr)
-                
+
                 # Try to get more error context
                 if hasattr(api_error, 'response'):
                     print(f"[LangExtract] API response status: {getattr(api_error.response, 'status_code', 'unknown')}", file=sys.stderr)
                     print(f"[LangExtract] API response headers: {getattr(api_error.response, 'headers', 'unknown')}", file=sys.stderr)
-                
+
                 return {
                     "error": f"{self.model_name} API error: {str(api_error)}",
                     "entities": [],
@@ -248,84 +650,9 @@ RESPONSE FORMAT (JSON only):
                         "errorType": type(api_error).__name__
                     }
                 }
-            
-            # Process results into our expected format
-            entities = []
-            extractions = result_json.get("extractions", {})
-            
-            print(f"[LangExtract] Processing extractions of type: {type(extractions)}", file=sys.stderr)
-            print(f"[LangExtract] Extractions content: {extractions}", file=sys.stderr)
-            
-            # Handle case where extractions might be a list instead of dict
-            if isinstance(extractions, list):
-                print(f"[LangExtract] WARNING: extractions is a list, converting to dict", file=sys.stderr)
-                # Convert list to dict if possible
-                if extractions and isinstance(extractions[0], dict):
-                    # Try to convert list of dicts to single dict
-                    new_extractions = {}
-                    for i, item in enumerate(extractions):
-                        if isinstance(item, dict):
-                            for key, value in item.items():
-                                new_extractions[f"{key}_{i}" if key in new_extractions else key] = value
-                    extractions = new_extractions
-                else:
-                    extractions = {}
-            
-            # Ensure extractions is a dict
-            if not isinstance(extractions, dict):
-                print(f"[LangExtract] ERROR: extractions is not a dict after conversion: {type(extractions)}", file=sys.stderr)
-                extractions = {}
-            
-            for field_name, extraction_data in extractions.items():
-                print(f"[LangExtract] Processing field '{field_name}' with data type: {type(extraction_data)}", file=sys.stderr)
-                
-                # Handle case where extraction_data might not be a dict
-                if not isinstance(extraction_data, dict):
-                    print(f"[LangExtract] WARNING: extraction_data is not a dict: {type(extraction_data)}", file=sys.stderr)
-                    # Try to convert string to simple dict
-                    if isinstance(extraction_data, str):
-                        extraction_data = {"value": extraction_data, "confidence": 50}
-                    else:
-                        continue
-                
-                if extraction_data and extraction_data.get("value"):
-                    # Try to find the position in original text
-                    value = extraction_data["value"]
-                    start_pos = text_content.find(value)
-                    end_pos = start_pos + len(value) if start_pos != -1 else -1
-                    
-                    entities.append({
-                        "text": value,
-                        "type": field_name,
-                        "confidence": extraction_data.get("confidence", 50) / 100.0,
-                        "sourceLocation": {
-                            "start": start_pos if start_pos != -1 else 0,
-                            "end": end_pos if end_pos != -1 else len(value),
-                            "context": extraction_data.get("context", "")
-                        }
-                    })
-            
-            processing_time = int((time.time() - start_time) * 1000)
-            
-            return {
-                "entities": entities,
-                "processingTime": processing_time,
-                "tokensProcessed": len(text_content.split()),
-                "sourceMapping": [
-                    {
-                        "text": entity["text"],
-                        "originalPosition": entity["sourceLocation"]["start"],
-                        "extractedPosition": i
-                    } for i, entity in enumerate(entities)
-                ],
-                "metadata": {
-                    "language": "en",
-                    "documentLength": len(text_content),
-                    "chunkCount": 1,
-                    "model": self.model_name
-                }
-            }
-            
+
+            return self._assemble_result(result_json, text_content, start_time)
+
         except Exception as e:
             return {
                 "error": str(e),
@@ -336,35 +663,229 @@ RESPONSE FORMAT (JSON only):
                 "metadata": {}
             }
 
+    def batch_extract_entities(self, records: List[Dict[str, Any]], poll_interval: int = 30, timeout: int = 86400) -> Dict[str, Any]:
+        """Extract entities for many domains through Gemini Batch Mode
+
+        Batch Mode runs at half the per-token price with separate, higher
+        rate limits, which is the right trade for offline enrichment of
+        thousands of domains; results arrive within a 24h window. Each
+        record is {"key": ..., "content": ..., "schema": ..., "domain": ...};
+        returns a dict of results keyed by record key. The synchronous
+        extract_entities path stays for latency-sensitive callers.
+        """
+        # The Batch endpoint lives in the newer google-genai SDK
+        from google import genai as genai_sdk
+
+        api_key = os.environ.get('GEMINI_API_KEY')
+        if not api_key:
+            return {"error": "Gemini API key not configured"}
+
+        start_time = time.time()
+        client = genai_sdk.Client(api_key=api_key)
+
+        # Build one batch request line per record, reusing the single-call
+        # prompt construction
+        prepared = {}
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as f:
+            for record in records:
+                key = str(record['key'])
+                text_content = self._prepare_text(record.get('content', ''), record.get('domain'))
+                prompt = self._build_prompt(text_content, record.get('schema', {}), record.get('domain'))
+                prepared[key] = text_content
+                f.write(json.dumps({
+                    "key": key,
+                    "request": {"contents": [{"parts": [{"text": prompt}]}]}
+                }) + "\n")
+            batch_file = f.name
+
+        try:
+            print(f"[LangExtract] Submitting batch of {len(prepared)} records", file=sys.stderr)
+            uploaded = client.files.upload(
+                file=batch_file,
+                config={"mime_type": "application/jsonl"}
+            )
+            batch_job = client.batches.create(model=self.model_name, src=uploaded.name)
+
+            # Poll until the job leaves the running states
+            deadline = time.time() + timeout
+            while batch_job.state.name in ('JOB_STATE_PENDING', 'JOB_STATE_RUNNING'):
+                if time.time() > deadline:
+                    return {"error": f"Batch job {batch_job.name} timed out"}
+                time.sleep(poll_interval)
+                batch_job = client.batches.get(name=batch_job.name)
+
+            print(f"[LangExtract] Batch job finished: {batch_job.state.name}", file=sys.stderr)
+            if batch_job.state.name != 'JOB_STATE_SUCCEEDED':
+                return {"error": f"Batch job failed with state {batch_job.state.name}"}
+
+            # Stream results and run the existing parse/assembly per key
+            results = {}
+            result_bytes = client.files.download(file=batch_job.dest.file_name)
+            for line in result_bytes.decode().splitlines():
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                key = str(entry.get('key'))
+                try:
+                    response_text = entry['response']['candidates'][0]['content']['parts'][0]['text']
+                except (KeyError, IndexError, TypeError):
+                    results[key] = {"error": "Malformed batch response", "entities": []}
+                    continue
+                result_json = self._parse_response_json(response_text)
+                results[key] = self._assemble_result(result_json, prepared.get(key, ''), start_time)
+
+            return results
+        finally:
+            os.unlink(batch_file)
+
+    def _ensure_async_primitives(self):
+        """Create loop-bound primitives and the async client on first use"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+            self._bucket_lock = asyncio.Lock()
+        if self._aio_client is None:
+            from google import genai as genai_sdk
+            self._aio_client = genai_sdk.Client(api_key=os.environ.get('GEMINI_API_KEY'))
+
+    async def _acquire_tokens(self, estimated_tokens: int):
+        """Token bucket refilled at tokens_per_minute; sleeps until funded"""
+        async with self._bucket_lock:
+            while True:
+                now = time.monotonic()
+                refill = (now - self._bucket_updated) * self.tokens_per_minute / 60.0
+                self._bucket_tokens = min(float(self.tokens_per_minute), self._bucket_tokens + refill)
+                self._bucket_updated = now
+                if self._bucket_tokens >= estimated_tokens:
+                    self._bucket_tokens -= estimated_tokens
+                    return
+                deficit = estimated_tokens - self._bucket_tokens
+                await asyncio.sleep(deficit * 60.0 / self.tokens_per_minute)
+
+    async def extract_entities_async(self, html_content: str, schema: Dict[str, str], domain: str = None) -> Dict[str, Any]:
+        """Async variant of extract_entities for concurrent batch callers
+
+        The Gemini call is pure I/O wait, so N concurrent requests give
+        roughly N-fold wall-clock speedup until the semaphore or the token
+        bucket throttles; prompts pre-pay an estimated len//4 tokens.
+        """
+        start_time = time.time()
+
+        if not os.environ.get('GEMINI_API_KEY'):
+            return {
+                "error": "Gemini API key not configured",
+                "entities": [],
+                "processingTime": 0,
+                "tokensProcessed": 0,
+                "sourceMapping": [],
+                "metadata": {}
+            }
+
+        self._ensure_async_primitives()
+        text_content = self._prepare_text(html_content, domain)
+        prompt = self._build_prompt(text_content, schema, domain)
+
+        await self._acquire_tokens(len(prompt) // 4)
+        async with self._semaphore:
+            api_call_start = time.time()
+            try:
+                response = await self._aio_client.aio.models.generate_content(
+                    model=self.model_name,
+                    contents=prompt,
+                    config={"response_mime_type": "application/json"}
+                )
+            except Exception as api_error:
+                api_call_duration = int((time.time() - api_call_start) * 1000)
+                print(f"[LangExtract] Async API call failed after {api_call_duration}ms: {api_error}", file=sys.stderr)
+                return {
+                    "error": f"{self.model_name} API error: {str(api_error)}",
+                    "entities": [],
+                    "processingTime": int((time.time() - start_time) * 1000),
+                    "tokensProcessed": 0,
+                    "sourceMapping": [],
+                    "metadata": {
+                        "model": self.model_name,
+                        "apiCallDuration": api_call_duration,
+                        "errorType": type(api_error).__name__
+                    }
+                }
+
+        response_text = getattr(response, 'text', None)
+        if not response_text:
+            return {
+                "error": f"Null response from {self.model_name}",
+                "entities": [],
+                "processingTime": int((time.time() - start_time) * 1000),
+                "tokensProcessed": 0,
+                "sourceMapping": [],
+                "metadata": {"model": self.model_name}
+            }
+
+        result_json = self._parse_response_json(response_text)
+        return self._assemble_result(result_json, text_content, start_time)
+
+    async def batch(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Run many async extractions concurrently; errors become result dicts"""
+        results = await asyncio.gather(
+            *[
+                self.extract_entities_async(r.get('content', ''), r.get('schema', {}), r.get('domain'))
+                for r in records
+            ],
+            return_exceptions=True
+        )
+        return [
+            r if not isinstance(r, Exception) else {"error": str(r), "entities": []}
+            for r in results
+        ]
+
 def main():
-    try:
-        # Read input data from stdin to handle large content
-        input_data = sys.stdin.read()
-        
-        if not input_data:
-            print(json.dumps({"error": "No input data received"}))
-            sys.exit(1)
-        
-        # Parse the input JSON containing content, schema, domain, and model
-        data = json.loads(input_data)
-        html_content = data.get('content', '')
-        schema = data.get('schema', {})
-        domain = data.get('domain', '')
-        model_name = data.get('model_name', 'gemini-2.5-flash')
-        
-        if not html_content or not schema:
-            print(json.dumps({"error": "Missing content or schema in input"}))
-            sys.exit(1)
-        
-        service = LangExtractService(model_name)
-        result = service.extract_entities(html_content, schema, domain)
-        print(json.dumps(result))
-    except json.JSONDecodeError as e:
-        print(json.dumps({"error": f"Invalid JSON input: {str(e)}"}))
-        sys.exit(1)
-    except Exception as e:
-        print(json.dumps({"error": str(e)}))
-        sys.exit(1)
+    """Long-lived worker loop: one JSON job per stdin line, one result per stdout line
+
+    The service - and with it the Gemini client - is constructed once per
+    model and reused for every job, instead of paying interpreter startup,
+    SDK import, and genai.configure per document. Callers keep the
+    subprocess alive and pipe jobs line-by-line; a single-shot caller that
+    writes one JSON line and closes stdin behaves exactly as before.
+    """
+    services = {}
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            data = json.loads(line)
+            model_name = data.get('model_name', 'gemini-2.5-flash')
+
+            service = services.get(model_name)
+            if service is None:
+                service = LangExtractService(model_name)
+                services[model_name] = service
+
+            # Bulk path: {"records": [{key, content, schema, domain}, ...]}
+            records = data.get('records')
+            if records:
+                result = service.batch_extract_entities(records)
+            else:
+                html_content = data.get('content', '')
+                schema = data.get('schema', {})
+                domain = data.get('domain', '')
+
+                if not html_content or not schema:
+                    result = {"error": "Missing content or schema in input"}
+                else:
+                    result = service.extract_entities(html_content, schema, domain)
+
+            # Compact separators shave ~15% off the bytes crossing the pipe;
+            # the flush below hands each result to the Node consumer as soon
+            # as it's ready so downstream DB writes overlap the next job
+            sys.stdout.write(json.dumps(result, separators=(",", ":")) + "\n")
+        except json.JSONDecodeError as e:
+            sys.stdout.write(json.dumps({"error": f"Invalid JSON input: {str(e)}"}, separators=(",", ":")) + "\n")
+        except Exception as e:
+            sys.stdout.write(json.dumps({"error": str(e)}, separators=(",", ":")) + "\n")
+
+        sys.stdout.flush()
 
 if __name__ == "__main__":
     main()
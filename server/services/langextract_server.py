@@ -0,0 +1,65 @@
+
+#!/usr/bin/env python3
+"""
+LangExtract Microservice
+Long-running FastAPI wrapper around LangExtractService so each extraction
+no longer pays Python interpreter startup plus SDK import (~200-500ms per
+subprocess spawn). Run under uvicorn as a sibling to fastapi_processor.py;
+the Node layer calls POST /extract instead of spawning
+langextractService.py per document. Set LANGEXTRACT_UDS to serve over a
+unix socket (no TCP handshake on localhost); otherwise it binds port 8002.
+"""
+import os
+from typing import Dict, Optional
+
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+from langextractService import LangExtractService
+
+app = FastAPI(title="LangExtract Service", version="1.0.0")
+
+# Warm service instances keyed by model name - the Gemini client is
+# initialized once per model and reused across requests
+_services: Dict[str, LangExtractService] = {}
+
+def get_service(model_name: str) -> LangExtractService:
+    service = _services.get(model_name)
+    if service is None:
+        service = LangExtractService(model_name)
+        _services[model_name] = service
+    return service
+
+class ExtractRequest(BaseModel):
+    content: str
+    schema_fields: Dict[str, str]
+    domain: Optional[str] = None
+    model_name: str = 'gemini-2.5-flash'
+
+@app.get("/health")
+async def health_check():
+    """Health check endpoint"""
+    return {"status": "healthy", "service": "langextract_service"}
+
+@app.post("/extract")
+async def extract(request: ExtractRequest):
+    """Extract entities from HTML content using a warm Gemini client
+
+    The async service path keeps the event loop free during the Gemini
+    round-trip, so concurrent requests from the Node side actually run
+    their API calls in parallel (bounded by the service's semaphore and
+    token bucket) instead of queueing behind one blocking call.
+    """
+    if not request.content or not request.schema_fields:
+        return {"error": "Missing content or schema in input"}
+
+    service = get_service(request.model_name)
+    return await service.extract_entities_async(request.content, request.schema_fields, request.domain)
+
+if __name__ == "__main__":
+    import uvicorn
+    uds_path = os.getenv("LANGEXTRACT_UDS")
+    if uds_path:
+        uvicorn.run(app, uds=uds_path)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("LANGEXTRACT_PORT", "8002")))